@@ -0,0 +1,31 @@
+# SPDX-FileCopyrightText: 2024 Sebastian Andersson <sebastian@bittr.nu>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Shared HTTP session setup for the web clients"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_session(*allowed_methods: str) -> requests.Session:
+    """Creates a keep-alive session with a small connection pool that
+    retries the given methods on transient gateway errors.
+
+    Only the status codes are retried, not connect errors or timeouts,
+    so an unreachable server still fails after one timeout. When the
+    retries run out the last response is returned to the caller."""
+    retry = Retry(
+        total=3,
+        connect=0,
+        read=False,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(allowed_methods),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -4,27 +4,33 @@
 
 """Moonraker Web Client"""
 
-import requests
+from .http_session import create_session
 
 
-# pylint: disable=R0903
 class MoonrakerWebClient:
     """Moonraker Web Client"""
 
     def __init__(self, url: str):
         self.url = url
+        self._endpoint = url.rstrip("/") + "/api/printer/command"
+        # The request has a fixed shape, only the integers change.
+        self._body_tmpl = b'{"commands":["MMU_GATE_MAP GATE=%d SPOOLID=%d"]}'
+        # Keep the connection to moonraker open between the commands.
+        # Setting the gate map is idempotent, so POST is safe to retry.
+        self._session = create_session("POST")
+        self._session.headers.update(
+            {"Connection": "keep-alive", "Content-Type": "application/json"}
+        )
 
     def set_spool_and_filament(self, spool: int, filament: int, gate: int):
         """Calls moonraker with the current spool & filament"""
 
-        commands = {
-            "commands": [
-                f"MMU_GATE_MAP GATE={gate} SPOOLID={spool}",
-            ]
-        }
+        body = self._body_tmpl % (int(gate), int(spool))
 
-        response = requests.post(
-            self.url + "/api/printer/command", timeout=10, json=commands
-        )
+        response = self._session.post(self._endpoint, timeout=10, data=body)
         if response.status_code != 200:
             raise ValueError(f"Request to moonraker failed: {response}")
+
+    def close(self):
+        """Closes the connection(s) to moonraker"""
+        self._session.close()
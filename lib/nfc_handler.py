@@ -33,6 +33,7 @@ class NfcHandler:
         self.write_event = Event()
         self.write_spool = None
         self.write_filament = None
+        self.current_data = (None, None)
 
     def set_no_tag_present_callback(self, on_nfc_no_tag_present):
         """Sets a callback that will be called when no tag is present"""
@@ -98,6 +99,11 @@ class NfcHandler:
 
         return False
 
+    def read_current(self):
+        """Returns the (spool, filament) of the tag on the reader.
+        (None, None) if no tag with data is present."""
+        return self.current_data
+
     def run(self):
         """Run the NFC handler, won't return"""
         # Open NFC reader. Will throw an exception if it fails.
@@ -107,6 +113,7 @@ class NfcHandler:
                 if tag:
                     self._check_for_write_to_tag(tag)
                     if tag.ndef is None:
+                        self.current_data = (None, None)
                         if self.on_nfc_no_tag_present:
                             self.on_nfc_no_tag_present()
                     else:
@@ -119,6 +126,7 @@ class NfcHandler:
                         if self._check_for_write_to_tag(tag):
                             self._read_from_tag(tag)
                         time.sleep(0.2)
+                    self.current_data = (None, None)
                 else:
                     time.sleep(0.2)
 
@@ -162,6 +170,7 @@ class NfcHandler:
 
     def _read_from_tag(self, tag):
         """Read data from tag and call callback"""
+        spool, filament = NfcHandler.get_data_from_ndef_records(tag.ndef.records)
+        self.current_data = (spool, filament)
         if self.on_nfc_tag_present:
-            spool, filament = NfcHandler.get_data_from_ndef_records(tag.ndef.records)
             self.on_nfc_tag_present(spool, filament)
@@ -4,10 +4,10 @@
 """Spoolman client"""
 
 import json
-import requests
+
+from .http_session import create_session
 
 
-# pylint: disable=R0903
 class SpoolmanClient:
     """Spoolman Web Client"""
 
@@ -15,12 +15,18 @@ class SpoolmanClient:
         if url.endswith("/"):
             url = url[:-1]
         self.url = url
+        self._spools_url = url + "/api/v1/spool"
+        # Keep the connection to spoolman open between the requests.
+        self._session = create_session("GET")
 
     def get_spools(self):
         """Get the spools from spoolman"""
-        url = self.url + "/api/v1/spool"
-        response = requests.get(url, timeout=10)
+        response = self._session.get(self._spools_url, timeout=10)
         if response.status_code != 200:
             raise ValueError(f"Request to spoolman failed: {response}")
         records = json.loads(response.text)
         return records
+
+    def close(self):
+        """Closes the connection(s) to spoolman"""
+        self._session.close()
@@ -10,158 +10,221 @@ import os
 import sys
 import shutil
 import threading
+import time
 from pathlib import Path
 
-from flask import Flask, render_template
-import toml
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
 
 from lib.moonraker_web_client import MoonrakerWebClient
 from lib.nfc_handler import NfcHandler
-from lib.spoolman_client import SpoolmanClient
 
 SPOOL = "SPOOL"
 FILAMENT = "FILAMENT"
 NDEF_TEXT_TYPE = "urn:nfc:wkt:T"
 
+SPOOLS_CACHE_TTL = 30  # Seconds to reuse the spool list from spoolman
+
 CFG_DIR = "~/.config/nfc2klipper"
 
+_HOME = os.path.expanduser("~")  # Looked up once, it may need a passwd lookup
+
+
+def _expand(path: str) -> str:
+    """Expands a leading ~ to the user's home dir"""
+    return path.replace("~", _HOME, 1) if path.startswith("~") else path
+
+
+CFG_DIR_EXPANDED = _expand(CFG_DIR)
+
+LOG_LEVEL = (os.environ.get("NFC2KLIPPER_LOGLEVEL") or "INFO").upper()
+KNOWN_LOG_LEVEL = isinstance(logging.getLevelName(LOG_LEVEL), int)
 logging.basicConfig(
-    level=logging.DEBUG, format="%(asctime)s %(levelname)s - %(name)s: %(message)s"
+    level=LOG_LEVEL if KNOWN_LOG_LEVEL else "INFO",
+    format="%(asctime)s %(levelname)s - %(name)s: %(message)s",
 )
+logger = logging.getLogger("nfc2klipper")
+if not KNOWN_LOG_LEVEL:
+    logger.warning("Unknown NFC2KLIPPER_LOGLEVEL %s, using INFO", LOG_LEVEL)
 
-args = None  # pylint: disable=C0103
-for path in ["~/nfc2klipper.cfg", CFG_DIR + "/nfc2klipper.cfg"]:    #get the full path name from the config path?
-    cfg_filename = os.path.expanduser(path)                         #set a variable with the full path name including the user.
-    if os.path.exists(cfg_filename):                                #if the file exists,
-        with open(cfg_filename, "r", encoding="utf-8") as fp:       #open it and
-                args = toml.load(fp)                                #read the values
-                break                                               #end the for loop
 
-if not args:                                                        #if the file was empty
+def _load_config(filename: Path) -> dict:
+    """Parses the TOML config file, with the stdlib tomllib on Python 3.11+
+    and the toml package on older versions"""
+    if tomllib:
+        with open(filename, "rb") as fp:
+            return tomllib.load(fp)
+    import toml  # pylint: disable=C0415,E0401  # Only installed for Python < 3.11
+
+    with open(filename, "r", encoding="utf-8") as fp:
+        return toml.load(fp)
+
+
+CFG_CANDIDATES = [                                                  #the places to look for the config file, in order
+    Path(_expand("~/nfc2klipper.cfg")),
+    Path(CFG_DIR_EXPANDED) / "nfc2klipper.cfg",
+]
+cfg_file = next((p for p in CFG_CANDIDATES if p.is_file()), None)   #use the first one that exists
+args = _load_config(cfg_file) if cfg_file else None  # pylint: disable=C0103
+
+if not args:                                                        #if the file was missing or empty
     print(
         "WARNING: The config file is missing, installing a default version.",
         file=sys.stderr,
     )
-    if not os.path.exists(CFG_DIR):                                 #if the directory doesn't exist
-        cfg_dir = os.path.expanduser(CFG_DIR)                       #create a full path name with the user
+    cfg_dir = CFG_CANDIDATES[-1].parent                             #the full path name of the config dir
+    if not cfg_dir.is_dir():                                        #if the directory doesn't exist
         print(f"Creating dir {cfg_dir}", file=sys.stderr)           #tell the console what's happening
-        Path(cfg_dir).mkdir(parents=True, exist_ok=True)            #make the folder
-    script_dir = os.path.dirname(__file__)                          #get the path name of where we are
-    from_filename = os.path.join(script_dir, "nfc2klipper.cfg")     #add the filename to said path
-    to_filename = os.path.join(cfg_dir, "nfc2klipper.cfg")          #add the filename to the destination path.
+        cfg_dir.mkdir(parents=True, exist_ok=True)                  #make the folder
+    from_filename = Path(__file__).parent / "nfc2klipper.cfg"       #the default config next to this program
+    to_filename = CFG_CANDIDATES[-1]                                #where it should be installed
     shutil.copyfile(from_filename, to_filename)                     #copy the file
     print(f"Created {to_filename}, please update it", file=sys.stderr)
     sys.exit(1)                                                     #stop the program until the config has been updated.
 
 #assuming we got some values from the config:
-spoolman = SpoolmanClient(args["spoolman"]["spoolman-url"])         #set spoolman url from the config file
 moonraker = MoonrakerWebClient(args["moonraker"]["moonraker-url"])  #set moonraker url from the config file
 nfc_handler = NfcHandler(args["nfc"]["nfc-device"])                 #set the port that the reader is connected to.
 mmu_enable = args['mmu']
 
+CLEAR_SPOOL = bool(args["moonraker"].get("clear_spool"))            #resolve the config lookups once, not per tag read
+WEB_DISABLED = bool(args["webserver"].get("disable_web_server"))
+WEB_ADDR = args["webserver"].get("web_address")
+WEB_PORT = args["webserver"].get("web_port")
+
 
-app = Flask(__name__)                                               #create the web application
+_LAST_SPOOL_FILAMENT = (None, None)                                 #the last spool & filament sent to moonraker
 
 
 def set_spool_and_filament(spool: int, filament: int):              #tells moonraker 
     """Calls moonraker with the current spool & filament"""
+    global _LAST_SPOOL_FILAMENT  # pylint: disable=W0603
 
-    if "old_spool" not in set_spool_and_filament.__dict__:          #if the old filament is not in the dictionary,
-        set_spool_and_filament.old_spool = None                     #set the old_spool to none
-        set_spool_and_filament.old_filament = None                  #set the old_spool to none
-
-    if (                                                            #if the spool is the same and
-        set_spool_and_filament.old_spool == spool
-        and set_spool_and_filament.old_filament == filament         #the filament is the same,
-    ):
-        app.logger.info("Read same spool & filament")               #log it and
+    if _LAST_SPOOL_FILAMENT == (spool, filament):                   #if the spool and the filament are the same,
+        if logger.isEnabledFor(logging.DEBUG):                      #log it and
+            logger.debug("Read same spool & filament")
         return                                                      #end the function
 
-    app.logger.info("Sending spool #%s, filament #%s to klipper", spool, filament) #log the filament change
+    logger.info("Sending spool #%s, filament #%s to klipper", spool, filament) #log the filament change
 
-    set_spool_and_filament.old_spool = None                         #set the old_spool to none, just in case this fails.  
-    set_spool_and_filament.old_filament = None                      #set the old_filament to none
+    _LAST_SPOOL_FILAMENT = (None, None)                             #forget the old values, just in case this fails.
 
     try:                                                            #try
         moonraker.set_spool_and_filament(spool, filament,0)         #setting the gate's spool ID via gcode
     except Exception as ex:  # pylint: disable=W0718
-        app.logger.error(ex)
+        logger.error(ex)
         return
 
-    set_spool_and_filament.old_spool = spool                        #set the old_spool for checking if there was a change (above)
-    set_spool_and_filament.old_filament = filament                  #set the old_filament for checking if there was a change (above)
-
-
-@app.route("/w/<int:spool>/<int:filament>")                         #create web page for filament
-def write_tag(spool, filament):                                     #create write_tag function
-    """
-    The web-api to write the spool & filament data to NFC/RFID tag
-    """
-    app.logger.info("  write spool=%s, filament=%s", spool, filament) #log it
-    if nfc_handler.write_to_tag(spool, filament):                   #write the values to the tag    
-        return "OK"                                                 #finish up
-    return ("Failed to write to tag", 502)                          #return an error if it failed
-
-
-@app.route("/")                                                     #main web page
-def index():                                                        #define it
-    """
-    Returns the main index page.
-    """
-    spools = spoolman.get_spools()                                  #get a list of spools from the spoolman server     
-
-    return render_template("index.html", spools=spools)             #show the list of spools on the website
-
-
-def should_clear_spool() -> bool:                               
-    """Returns True if the config says the spool should be cleared"""
-    if args["moonraker"].get("clear_spool"):
-        return True
-    return False
+    _LAST_SPOOL_FILAMENT = (spool, filament)                        #remember them for checking if there was a change (above)
+
+
+def _make_app(spoolman_client):
+    """Creates the web application, flask is only imported when it is used"""
+    # pylint: disable=C0415
+    from flask import Flask, redirect, render_template, url_for
+
+    app = Flask(__name__)                                           #create the web application
+
+    @app.route("/w/<int:spool>/<int:filament>")                     #create web page for filament
+    def write_tag(spool, filament):                                 #create write_tag function
+        """
+        The web-api to write the spool & filament data to NFC/RFID tag
+        """
+        logger.info("  write spool=%s, filament=%s", spool, filament) #log it
+        if nfc_handler.read_current() == (str(spool), str(filament)):  #if the tag already has the values,
+            return "OK (unchanged)"                                 #skip the slow write
+        if nfc_handler.write_to_tag(spool, filament):               #write the values to the tag
+            return "OK"                                             #finish up
+        return ("Failed to write to tag", 502)                      #return an error if it failed
+
+    index_cache = {"time": 0.0, "page": None}                       #the index page rendered from the last spool list
+
+    def cached_index_page():
+        """Returns the index page, fetching spoolman's spools and rendering
+        it again at most every SPOOLS_CACHE_TTL seconds"""
+        now = time.monotonic()
+        if (
+            index_cache["page"] is None
+            or now - index_cache["time"] >= SPOOLS_CACHE_TTL
+        ):
+            spools = spoolman_client.get_spools()                   #get a list of spools from the spoolman server
+            index_cache["page"] = render_template("index.html", spools=spools)
+            index_cache["time"] = now
+        return index_cache["page"]
+
+    @app.route("/")                                                 #main web page
+    def index():                                                    #define it
+        """
+        Returns the main index page.
+        """
+        return cached_index_page()                                  #show the list of spools on the website
+
+    @app.route("/refresh")                                          #reload the spools from spoolman
+    def refresh():
+        """
+        Forgets the cached spools and returns to the main index page.
+        """
+        index_cache["page"] = None
+        return redirect(url_for("index"))
+
+    return app
 
 
 def on_nfc_tag_present(spool, filament):
     """Handles a read tag"""
 
-    if not should_clear_spool():                                    #if we're not clearing tags        
-        if not (spool and filament):                                #and there's not both values present,
-            app.logger.info("Did not find spool and filament records in tag")#log it
-    if should_clear_spool() or (spool and filament):                #if we are clearing tags, or there's new values present,
-        if not spool:                                               #if we're clearing the spool,
-            spool = 0                                               #clear it
-        if not filament:                                            #if we're clearing the spool,
-            filament = 0                                            #clear it    
-        set_spool_and_filament(spool, filament)                     #set the filament via moonraker
+    if not (CLEAR_SPOOL or (spool and filament)):                   #if we're not clearing tags and there's not both values present,
+        logger.info("Did not find spool and filament records in tag")#log it
+        return
+    set_spool_and_filament(spool or 0, filament or 0)               #set the filament via moonraker, missing values clear it
 
 
 def on_nfc_no_tag_present():
     """Called when no tag is present (or tag without data)"""
-    if should_clear_spool():
+    if CLEAR_SPOOL:
         set_spool_and_filament(0, 0)
 
 
 if __name__ == "__main__":                                          #main function that runs everything.
 
-    if should_clear_spool():                                        #if we're clearing spools,
+    if CLEAR_SPOOL:                                                 #if we're clearing spools,
         set_spool_and_filament(0, 0)                                # Start by unsetting current spool & filament
 
     nfc_handler.set_no_tag_present_callback(on_nfc_no_tag_present)  #set up the dection for the tag being removed?
     nfc_handler.set_tag_present_callback(on_nfc_tag_present)        #set up the dection for the tag being presented?
 
-    if not args["webserver"].get("disable_web_server"):             #if we are starting the web server,
-        app.logger.info("Starting nfc-handler")                     #log it    
-        thread = threading.Thread(target=nfc_handler.run)           #set the nfc_handler to run on the back end
-        thread.daemon = True                                        
+    if not WEB_DISABLED:                                            #if we are starting the web server,
+        from lib.spoolman_client import SpoolmanClient
+        from waitress import serve
+
+        spoolman = SpoolmanClient(args["spoolman"]["spoolman-url"]) #set spoolman url from the config file
+        web_app = _make_app(spoolman)
+
+        logger.info("Starting nfc-handler")                         #log it    
+        thread = threading.Thread(                                  #set the nfc_handler to run on the back end,
+            target=nfc_handler.run, name="nfc-handler", daemon=True  #in an OS thread as nfcpy's serial/USB I/O blocks
+        )
         thread.start()                                              #start it
 
-        app.logger.info("Starting web server")                      #log it
+        logger.info("Starting web server")                          #log it
         try:                                                        #try running
-            app.run(                                                #the web app
-                args["webserver"]["web_address"], port=args["webserver"]["web_port"]    #with these arguments
+            serve(                                                  #the web app with waitress
+                web_app, host=WEB_ADDR, port=WEB_PORT,                  #with these arguments
+                threads=4,                                          #so a slow spoolman call doesn't block tag writes
+                connection_limit=64,
+                channel_timeout=30,
             )
         except Exception:                                           #if it fails
             nfc_handler.stop()                                      #stop the background task
             thread.join()                                           #bring it to the foreground
             raise                                                   #raise and exception    
+        finally:
+            moonraker.close()                                       #close the connection to moonraker
+            spoolman.close()                                        #and to spoolman
     else:                                                           #if we aren't running the web server
-        nfc_handler.run()                                           #just run the nfc hander on the front end.
+        try:
+            nfc_handler.run()                                       #just run the nfc hander on the front end.
+        finally:
+            moonraker.close()                                       #close the connection to moonraker